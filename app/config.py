@@ -2,8 +2,19 @@ from pydantic_settings import BaseSettings
 
 from dotenv import find_dotenv
 
+from app.constants import MAX_REQUESTS_PER_MINUTE, MAX_TOKENS_PER_MINUTE
+
 class Settings(BaseSettings):
     OPENAI_API_KEY: str
+    # Account rate limits the batch scoring scheduler stays under.
+    OPENAI_MAX_REQUESTS_PER_MINUTE: int = MAX_REQUESTS_PER_MINUTE
+    OPENAI_MAX_TOKENS_PER_MINUTE: int = MAX_TOKENS_PER_MINUTE
+    # Send scanned documents as binary Files API uploads; set to false to send
+    # base64 page images inline instead.
+    OPENAI_UPLOAD_DOCUMENTS: bool = True
+    # Interpreter that runs unoserver; it must be able to import LibreOffice's `uno`
+    # module (e.g. /usr/bin/python3 with python3-uno). Empty: no unoserver, one LibreOffice per file.
+    UNOSERVER_PYTHON: str = ""
 
 
 
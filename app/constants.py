@@ -0,0 +1,6 @@
+# Defaults shared by the settings and the OpenAI client, kept free of imports so
+# that loading the settings does not pull in the client stack.
+
+# Default account rate limits the batch scheduler stays under.
+MAX_REQUESTS_PER_MINUTE = 500
+MAX_TOKENS_PER_MINUTE = 30_000
@@ -1,12 +1,141 @@
 
 import sys
+import threading
+import time
+
+from collections import OrderedDict, deque
 
-import asyncio
 from datetime import datetime
-from typing import Any
+from typing import Any, TextIO
 
 from loguru import logger as loguru_logger
 
+# Numeric severities of Loguru's built-in levels, used to drop filtered calls
+# before any message formatting happens.
+_LEVEL_NUMBERS = {
+    "TRACE": 5,
+    "DEBUG": 10,
+    "INFO": 20,
+    "SUCCESS": 25,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+}
+
+# Identical ERROR/CRITICAL messages repeated within this many seconds are
+# suppressed; at most ERROR_DEDUP_MAX_ENTRIES recent messages are remembered.
+ERROR_DEDUP_WINDOW = 1.0
+ERROR_DEDUP_MAX_ENTRIES = 512
+
+LOG_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
+    "<level>{level: <8}</level> | "
+    "<cyan>{file}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+    "<level>{message}</level>"
+)
+
+
+class _QueueSink:
+    """
+    Loguru sink that hands formatted records to a bounded in-process queue.
+
+    A daemon thread drains the queue in batches and writes each batch to the
+    wrapped stream with a single write()/flush(), so callers never block on I/O
+    and records are not pickled the way Loguru’s ``enqueue=True`` does.
+
+    Under burst load the queue applies backpressure by dropping records: once it
+    holds ``high_watermark`` records, anything below ``drop_below_level`` is
+    discarded, so the rest of the queue is a reserve for more severe records.
+    When it is completely full, a new severe record evicts the oldest queued
+    low-severity one; it is only dropped if every queued record is severe too.
+    The drain thread reports how many records were dropped instead of writing them.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        maxsize: int = 10_000,
+        batch_size: int = 256,
+        high_watermark: int = None,
+        drop_below_level: str = "WARNING",
+    ):
+        """
+        :param stream: The text stream the drain thread writes to.
+        :param maxsize: Maximum number of records buffered.
+        :param batch_size: Maximum number of records joined into a single write.
+        :param high_watermark: Queue size from which low-severity records are dropped.
+                               Defaults to 80% of ``maxsize``.
+        :param drop_below_level: Records below this level are dropped past the watermark,
+                                 and evicted first when the queue is full.
+        """
+        self._stream = stream
+        self._records: deque[tuple[int, str]] = deque()
+        self._maxsize = maxsize
+        self._batch_size = batch_size
+        self._high_watermark = high_watermark if high_watermark is not None else maxsize * 4 // 5
+        self._drop_below_no = _LEVEL_NUMBERS[drop_below_level.upper()]
+        self._dropped = 0
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._drain, name="app-logger-drain", daemon=True)
+        self._thread.start()
+
+    def write(self, message: Any) -> None:
+        """Called by Loguru for every record; never blocks on I/O."""
+        level_no = message.record["level"].no
+        text = str(message)
+        with self._condition:
+            size = len(self._records)
+            if (size >= self._high_watermark and level_no < self._drop_below_no) or (
+                size >= self._maxsize and not self._evict_low_severity()
+            ):
+                self._dropped += 1
+                return
+            self._records.append((level_no, text))
+            self._condition.notify()
+
+    def isatty(self) -> bool:
+        """Let Loguru decide on colorization based on the wrapped stream."""
+        return self._stream.isatty()
+
+    def stop(self) -> None:
+        """Called by Loguru when the sink is removed: flush what is queued and stop."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout=5)
+
+    def _evict_low_severity(self) -> bool:
+        """
+        Make room by removing the oldest queued record below ``drop_below_level``,
+        counting it as dropped. Returns False if there is no such record.
+        Called with the condition held.
+        """
+        for index, (level_no, _) in enumerate(self._records):
+            if level_no < self._drop_below_no:
+                del self._records[index]
+                self._dropped += 1
+                return True
+        return False
+
+    def _drain(self) -> None:
+        while True:
+            with self._condition:
+                while not self._records and not self._stopping:
+                    self._condition.wait()
+                count = min(self._batch_size, len(self._records))
+                messages = [self._records.popleft()[1] for _ in range(count)]
+                stopping = self._stopping and not self._records
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                messages.append(f"AppLogger: {dropped} log records dropped under load.\n")
+            if messages:
+                self._stream.write("".join(messages))
+                self._stream.flush()
+            if stopping:
+                return
+
+
 class AppLogger:
     def __init__(
         self,
@@ -14,6 +143,7 @@ class AppLogger:
         log_level: str = "DEBUG",
         rotation: str = "1 day",
         retention: str = "10 days",
+        enqueue_stdout: bool = False,
     ):
         """
         Initialize the asynchronous logger.
@@ -23,21 +153,26 @@ class AppLogger:
         :param log_level: The minimum log level (e.g. "DEBUG", "INFO").
         :param rotation: Log file rotation policy (e.g. "1 day" or "10 MB").
         :param retention: Log file retention policy (e.g. "10 days").
+        :param enqueue_stdout: Buffer console records in a bounded queue drained by a
+                               background thread. Off by default: in containers stdout is
+                               a pipe already drained by Docker/systemd, and writing it
+                               directly is cheaper than queueing.
         """
         self.log_level = log_level.upper()
+        self._min_level_no = loguru_logger.level(self.log_level).no
+        self._set_loggers(loguru_logger)
+        self._recent_errors: OrderedDict[str, float] = OrderedDict()
         # Remove any pre-existing sinks.
         loguru_logger.remove()
 
         # --- Console Sink ---
-        # Use sys.stdout; the sink runs with enqueue=True to offload I/O.
+        # Written directly, or through a bounded in-process queue drained by a
+        # background thread that batches writes to sys.stdout.
         loguru_logger.add(
-            sys.stdout,
-            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
-                   "<level>{level: <8}</level> | "
-                   "<cyan>{file}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
-                   "<level>{message}</level>",
+            _QueueSink(sys.stdout) if enqueue_stdout else sys.stdout,
+            format=LOG_FORMAT,
             level=self.log_level,
-            enqueue=True,
+            enqueue=False,
         )
 
         # --- File Sink ---
@@ -49,46 +184,56 @@ class AppLogger:
             log_file,
             rotation=rotation,
             retention=retention,
-            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | "
-                   "<level>{level: <8}</level> | "
-                   "<cyan>{file}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
-                   "<level>{message}</level>",
+            format=LOG_FORMAT,
             level=self.log_level,
+            # The file sink keeps Loguru’s own queue: rotation and retention
+            # are implemented by Loguru’s file handler.
             enqueue=True,
         )
 
-    async def _log(self, level: str, *args: Any, **kwargs: Any) -> None:
+    def _log(self, level: str, *args: Any, **kwargs: Any) -> None:
         """
         Internal helper: format the message and log at the given level.
-        The actual call is synchronous but offloaded via Loguru’s enqueue.
-        We add a trivial await (asyncio.sleep(0)) so that this method can be awaited.
+        The call is synchronous; Loguru’s enqueue already offloads the sink I/O
+        to a background thread, so there is nothing to await here.
+
+        :param level: An upper-case Loguru level name (e.g. "INFO").
         """
+        # Skip filtered-out levels before paying for any string building.
+        if _LEVEL_NUMBERS.get(level, self._min_level_no) < self._min_level_no:
+            return
         # Concatenate all positional arguments into a single message string.
-        message = " ".join(map(str, args))
+        if len(args) == 1:
+            message = str(args[0])
+        elif len(args) == 2:
+            message = f"{args[0]} {args[1]}"
+        else:
+            message = " ".join(map(str, args))
+        # Collapse storms of identical errors, e.g. a batch of bad uploads.
+        if _LEVEL_NUMBERS.get(level, 0) >= _LEVEL_NUMBERS["ERROR"] and not self._should_emit(message):
+            return
         # Use Loguru’s .opt() to capture the caller’s stack information.
-        loguru_logger.opt(depth=2).log(level.upper(), message, **kwargs)
-        # Yield control to the event loop.
-        await asyncio.sleep(0)
+        self._logger.log(level, message, **kwargs)
 
     async def debug(self, *args: Any, **kwargs: Any) -> None:
-        """Asynchronously log a DEBUG-level message."""
-        await self._log("DEBUG", *args, **kwargs)
+        """Log a DEBUG-level message (awaitable for existing async callers)."""
+        self._log("DEBUG", *args, **kwargs)
 
     async def info(self, *args: Any, **kwargs: Any) -> None:
-        """Asynchronously log an INFO-level message."""
-        await self._log("INFO", *args, **kwargs)
+        """Log an INFO-level message (awaitable for existing async callers)."""
+        self._log("INFO", *args, **kwargs)
 
     async def warning(self, *args: Any, **kwargs: Any) -> None:
-        """Asynchronously log a WARNING-level message."""
-        await self._log("WARNING", *args, **kwargs)
+        """Log a WARNING-level message (awaitable for existing async callers)."""
+        self._log("WARNING", *args, **kwargs)
 
     async def error(self, *args: Any, **kwargs: Any) -> None:
-        """Asynchronously log an ERROR-level message."""
-        await self._log("ERROR", *args, **kwargs)
+        """Log an ERROR-level message (awaitable for existing async callers)."""
+        self._log("ERROR", *args, **kwargs)
 
     async def critical(self, *args: Any, **kwargs: Any) -> None:
-        """Asynchronously log a CRITICAL-level message."""
-        await self._log("CRITICAL", *args, **kwargs)
+        """Log a CRITICAL-level message (awaitable for existing async callers)."""
+        self._log("CRITICAL", *args, **kwargs)
 
     def log_message(self, *args: Any, level: str = "INFO", **kwargs: Any) -> None:
         """
@@ -103,9 +248,41 @@ class AppLogger:
                       Defaults to "INFO".
         :param kwargs: Additional keyword arguments passed to the underlying logger.
         """
-        message = " ".join(map(str, args))
-        # Use opt(depth=2) so that the caller’s frame is captured in the log record.
-        loguru_logger.opt(depth=2).log(level.upper(), message, **kwargs)
+        # Delegating to _log keeps the caller’s frame at depth=2 in the log record.
+        self._log(level.upper(), *args, **kwargs)
+
+    def _should_emit(self, message: str) -> bool:
+        """
+        Return False if the same message was emitted less than ERROR_DEDUP_WINDOW
+        seconds ago; otherwise remember it and return True.
+        """
+        now = time.monotonic()
+        last_emitted = self._recent_errors.get(message)
+        if last_emitted is not None and now - last_emitted < ERROR_DEDUP_WINDOW:
+            return False
+        self._recent_errors[message] = now
+        self._recent_errors.move_to_end(message)
+        if len(self._recent_errors) > ERROR_DEDUP_MAX_ENTRIES:
+            self._recent_errors.popitem(last=False)
+        return True
+
+    def fast_info(self, message: str) -> None:
+        """
+        Log an already formatted INFO message with the least overhead: nothing to
+        await, no argument joining and no per-call .opt(). Meant for tight loops.
+        """
+        if self._min_level_no <= _LEVEL_NUMBERS["INFO"]:
+            self._fast_logger.info(message)
+
+    def _set_loggers(self, base_logger: Any) -> None:
+        """
+        Pre-build the Loguru loggers used on every call. `.opt()` creates a new
+        logger object each time it is called, so it is done once here instead.
+        Depths point at the caller of the public method: _log is two frames
+        below it, fast_info one.
+        """
+        self._logger = base_logger.opt(depth=2)
+        self._fast_logger = base_logger.opt(depth=1)
 
     def bind(self, **kwargs: Any) -> "AppLogger":
         """
@@ -115,10 +292,10 @@ class AppLogger:
         bound_instance = AppLogger.__new__(AppLogger)
         # Copy configuration from the current logger.
         bound_instance.log_level = self.log_level
+        bound_instance._min_level_no = self._min_level_no
+        bound_instance._recent_errors = self._recent_errors
         # Bind context to the underlying Loguru logger.
-        bound_instance._bound_logger = loguru_logger.bind(**kwargs)
-        # In our async helper, we delegate to the global loguru_logger.
-        # (The bound logger will be used automatically.)
+        bound_instance._set_loggers(loguru_logger.bind(**kwargs))
         return bound_instance
 
 
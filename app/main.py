@@ -1,7 +1,11 @@
+import asyncio
+import csv
 import io
 import json
 import os
+import shutil
 import sys
+import tempfile
 import traceback
 from typing import List
 
@@ -11,10 +15,9 @@ import openai
 from fastapi import FastAPI, File, Form, UploadFile
 from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import pandas as pd
 
 from app.logger import app_logger as logger
-from app.utils import DocxReader, PdfReader, OpenAIClient
+from app.utils import DocxReader, PdfReader, OpenAIClient, libreoffice_server
 from app.config import settings
 
 app = FastAPI(
@@ -23,24 +26,104 @@ app = FastAPI(
     version="1.0.0",
 )
 
-LLM_CLIENT = OpenAIClient(settings.OPENAI_API_KEY)
+LLM_CLIENT = OpenAIClient.get(
+    settings.OPENAI_API_KEY,
+    max_requests_per_minute=settings.OPENAI_MAX_REQUESTS_PER_MINUTE,
+    max_tokens_per_minute=settings.OPENAI_MAX_TOKENS_PER_MINUTE,
+)
+
+
+@app.on_event("startup")
+async def start_libreoffice_server():
+    """
+    Start one LibreOffice instance to be reused by every DOCX conversion, and wait
+    (off the event loop) until it accepts connections before serving requests.
+    """
+    await asyncio.to_thread(libreoffice_server.start, settings.UNOSERVER_PYTHON or None)
+
+
+@app.on_event("shutdown")
+async def stop_libreoffice_server():
+    libreoffice_server.stop()
+
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    """Delete the documents uploaded to OpenAI and close the client's connections."""
+    await LLM_CLIENT.aclose()
 
 FILE_TYPE_TO_EXTRACTOR = {
     ".pdf": PdfReader,
     ".docx": DocxReader,
 }
 
+# Copy uploads to disk in 1 MiB chunks instead of reading them into memory.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def save_upload(file: UploadFile, suffix: str) -> str:
+    """
+    Stream an uploaded file in fixed-size chunks to a new, uniquely named temporary file
+    and return its path. The caller deletes the file.
+    Blocking; run it in a worker thread from async code.
+    """
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
+        shutil.copyfileobj(file.file, f, UPLOAD_CHUNK_SIZE)
+    return f.name
+
 
-async def get_extractor(file: UploadFile):
+def get_file_extension(file: UploadFile) -> str:
+    """Lower-cased extension of the uploaded file name, including the dot ("" if there is none)."""
+    _, dot, ext = file.filename.rpartition(".")
+    return f".{ext.lower()}" if dot else ""
+
+
+def get_extractor(file: UploadFile):
     """
     Detect file type by extension and return the appropriate extractor class.
     """
-    filename = file.filename.lower()
-    _, ext = os.path.splitext(filename)
-    if ext not in FILE_TYPE_TO_EXTRACTOR:
-        await logger.error(f"Unsupported file type: {ext}")
+    ext = get_file_extension(file)
+    extractor_class = FILE_TYPE_TO_EXTRACTOR.get(ext)
+    if extractor_class is None:
+        logger.log_message(f"Unsupported file type: {ext}", level="ERROR")
         raise ValueError(f"Unsupported file type: {ext}")
-    return FILE_TYPE_TO_EXTRACTOR[ext]
+    return extractor_class
+
+
+async def read_upload(file: UploadFile) -> list[dict]:
+    """
+    Save an upload to a private temporary file, read it into LLM content parts
+    with the matching extractor, and delete the file again. Reading (text
+    extraction, DOCX conversion, page rendering) runs in a worker thread so the
+    event loop keeps serving other requests meanwhile.
+    Scanned documents are uploaded to OpenAI as binary files and referenced by
+    file id, unless OPENAI_UPLOAD_DOCUMENTS is turned off, in which case their
+    pages are rendered and sent inline as base64 images.
+    """
+    extractor_class = get_extractor(file)
+    tmp_path = await asyncio.to_thread(save_upload, file, get_file_extension(file))
+    try:
+        if settings.OPENAI_UPLOAD_DOCUMENTS:
+            return await extractor_class(tmp_path).to_uploaded_content_parts(LLM_CLIENT)
+        return await asyncio.to_thread(extractor_class(tmp_path).to_content_parts)
+    finally:
+        os.unlink(tmp_path)
+
+
+def iter_csv_rows(fieldnames: List[str], rows: List[dict]):
+    """
+    Yield a CSV document one line at a time, header first.
+    A single small buffer is reused, so the full CSV is never held in memory.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, lineterminator="\n")
+    writer.writeheader()
+    for row in rows:
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+    yield buffer.getvalue()
 
 
 @app.post("/extract-criteria", summary="Extract Ranking Criteria from Job Description")
@@ -66,13 +149,8 @@ async def extract_criteria_endpoint(file: UploadFile = File(...)):
     ```
     """
     try:
-        extractor_class = await get_extractor(file)
-        tmp_path = f"/tmp/{file.filename}"
-        with open(tmp_path, "wb") as f:
-            f.write(file.file.read())
-        extractor = extractor_class(tmp_path)
-        base64_images = extractor.convert_to_base64()
-        criteria = LLM_CLIENT.extract_criteria_json(base64_images)
+        content_parts = await read_upload(file)
+        criteria = await LLM_CLIENT.extract_criteria_json(content_parts)
         return {"criteria": criteria}
     except Exception as e:
         return JSONResponse(status_code=400, content={"error": str(e)})
@@ -110,17 +188,11 @@ async def score_resumes_endpoint(
             content={"error": "Invalid criteria format. Must be a JSON list of strings."},
         )
 
-    resumes_base64 = []
+    resumes = []
     candidate_names = []
     for file in files:
         try:
-            extractor_class = await get_extractor(file)
-            tmp_path = f"/tmp/{file.filename}"
-            with open(tmp_path, "wb") as f:
-                f.write(file.file.read())
-            extractor = extractor_class(tmp_path)
-            base64_images = extractor.convert_to_base64()
-            resumes_base64.append(base64_images)
+            resumes.append(await read_upload(file))
             # Extract candidate name from filename (remove extension)
             candidate_name = os.path.splitext(file.filename)[0]
             candidate_names.append(candidate_name)
@@ -130,15 +202,23 @@ async def score_resumes_endpoint(
 
     try:
         # Score all resumes using the LLM client
-        score_responses = LLM_CLIENT.score_multiple_resumes_against_criteria(criteria_list, resumes_base64)
+        score_responses = await LLM_CLIENT.score_multiple_resumes_against_criteria(criteria_list, resumes)
     except Exception as e:
         await logger.error(f"Error scoring resumes: {traceback.format_exc()}")
         return JSONResponse(status_code=400, content={"error": f"Error scoring resumes: {str(e)}"})
 
+    if score_responses and all(score_response is None for score_response in score_responses):
+        # Every request failed (each failure is logged), so there is nothing to report.
+        return JSONResponse(status_code=400, content={"error": "Error scoring resumes: no resume could be scored."})
+
     # Build the results list for CSV output.
-    # Assume each score_response is an instance of ScoreResponse.
+    # Each score_response is a ScoreResponse, or None if that resume could not be scored.
     results = []
     for idx, score_response in enumerate(score_responses):
+        if score_response is None:
+            # Keep the candidate in the CSV with blank scores.
+            results.append({"Candidate Name": candidate_names[idx]})
+            continue
         # Use candidate name from LLM if provided, else fallback to filename.
         candidate_name = score_response.candidate_name or candidate_names[idx]
         entry = {"Candidate Name": candidate_name}
@@ -148,13 +228,10 @@ async def score_resumes_endpoint(
         entry["Total Score"] = score_response.total_score
         results.append(entry)
 
-    # Create CSV output using pandas
-    df = pd.DataFrame(results)
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False)
-    csv_buffer.seek(0)
+    # Columns in order of first appearance across all rows, blank where a row lacks one.
+    fieldnames = list(dict.fromkeys(column for entry in results for column in entry))
     return StreamingResponse(
-        iter([csv_buffer.getvalue()]),
+        iter_csv_rows(fieldnames, results),
         media_type="text/csv",
         headers={"Content-Disposition": "attachment; filename=resume_scores.csv"},
     )
@@ -169,23 +246,14 @@ async def score_resumes_endpoint(
 
     criteria_list = json.loads(criteria)
     await logger.info(f"Extracted criteria: {criteria_list}")
-    resumes_base64 = []
+    resumes = []
     candidate_names = []
     for file in files:
         try:
 
-            await logger.info(f"Processing file: {file.filename}")
-
-            extractor_class = await get_extractor(file)
-            tmp_path = f"/tmp/{file.filename}"
-            with open(tmp_path, "wb") as f:
-                f.write(file.file.read())
-            extractor = extractor_class(tmp_path)
-
-            await logger.info(f"Converting {file.filename} to base64")
+            logger.fast_info(f"Processing file: {file.filename}")
 
-            base64_images = extractor.convert_to_base64()
-            resumes_base64.append(base64_images)
+            resumes.append(await read_upload(file))
             # Extract candidate name from filename (remove extension)
             candidate_name = os.path.splitext(file.filename)[0]
             candidate_names.append(candidate_name)
@@ -194,7 +262,7 @@ async def score_resumes_endpoint(
             return JSONResponse(status_code=400, content={"error": f"Error processing file {file.filename}: {str(e)}"})
     try:
         # Enhance all resumes using the LLM client
-        enhance_responses = LLM_CLIENT.get_suggestions_for_multiple_resumes(criteria_list, resumes_base64)
+        enhance_responses = await LLM_CLIENT.get_suggestions_for_multiple_resumes(criteria_list, resumes)
         return enhance_responses
 
     except Exception as e:
@@ -1,78 +1,438 @@
+from __future__ import annotations
+
 import os
-import base64
+import asyncio
+import functools
+import hashlib
+import heapq
+import json
+import shutil
+import socket
 import subprocess
 import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Iterable, Iterator
+
+import httpx
+from openai import AsyncOpenAI, AuthenticationError, PermissionDeniedError, RateLimitError
+import pybase64
+from pydantic import BaseModel, Field, ValidationError
+
+from app.constants import MAX_REQUESTS_PER_MINUTE, MAX_TOKENS_PER_MINUTE
+from app.logger import app_logger as logger
+
+# The document libraries are imported where they are used, so a worker only
+# loads the ones its requests actually need (text-only documents never touch
+# pdf2image).
+
+
+# Page rendering settings for the vision model: 150 DPI, capped at 1600px on the
+# longest side, saved as quality-60 JPEG (pdftoppm's libjpeg, 4:2:0 chroma
+# subsampling), is enough for the LLM to read resumes while keeping the base64
+# payload small.
+RENDER_DPI = 150
+MAX_PAGE_SIZE = 1600
+JPEG_QUALITY = 60
+
+# pdftoppm threads used to rasterize a document, leaving one core for the app.
+RENDER_THREADS = max(1, (os.cpu_count() or 1) - 1)
+
+# Documents with at least this much extractable text are sent to the LLM as text;
+# anything shorter is treated as scanned and rendered to page images.
+MIN_TEXT_CHARS = 200
+
+
+def _render_dpi(pdf_path: str) -> float:
+    """
+    DPI at which the document's largest page is at most MAX_PAGE_SIZE pixels on its
+    longest side, never above RENDER_DPI. Pages are rendered straight at this size
+    rather than rendered larger and scaled down, and small pages are never upscaled.
+    """
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        # Page sizes are in PDF points (1/72 inch).
+        longest_side = max((max(pdf.get_page_size(index)) for index in range(len(pdf))), default=0)
+    finally:
+        pdf.close()
+    if not longest_side:
+        return RENDER_DPI
+    return min(RENDER_DPI, MAX_PAGE_SIZE * 72 / longest_side)
+
+
+def _pdf_page_count(pdf_path: str) -> int:
+    """Number of pages of a PDF."""
+    import pypdfium2 as pdfium
+
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _iter_pdf_pages_base64(pdf_path: str, grayscale: bool = True) -> Iterator[str]:
+    """
+    Rasterize every page of a PDF and yield them, in order, as base64-encoded JPEGs.
+
+    pdftoppm renders and JPEG-encodes the pages itself on RENDER_THREADS
+    threads, writing them to a temporary folder; Python only reads the finished files
+    and base64-encodes their bytes, so pages are never decoded into PIL images.
+    Pages are read one at a time and each file is deleted once encoded, so only
+    one page's raw bytes are held in memory at any point.
+    With `grayscale`, pages are rendered as single-channel JPEGs, which are much smaller
+    for black-on-white documents such as resumes.
+    Rendering many pages in parallel opens many files at once: on macOS the default
+    `ulimit -n` of 256 may need raising (e.g. `ulimit -n 10000`) for very long documents.
+    """
+    from pdf2image import convert_from_path
+
+    with tempfile.TemporaryDirectory() as output_folder:
+        page_paths = convert_from_path(
+            pdf_path,
+            dpi=_render_dpi(pdf_path),
+            grayscale=grayscale,
+            thread_count=RENDER_THREADS,
+            output_folder=output_folder,
+            fmt="jpeg",
+            # No optimize pass: it re-scans the image to build Huffman tables for a few % smaller output.
+            jpegopt={"quality": JPEG_QUALITY, "optimize": False, "progressive": False},
+            paths_only=True,
+        )
+        for page_path in page_paths:
+            with open(page_path, "rb") as f:
+                page_bytes = f.read()
+            os.unlink(page_path)
+            yield pybase64.b64encode(page_bytes).decode("ascii")
 
-from docx2pdf import convert as docx2pdf_convert
-from pdf2image import convert_from_path
-from PIL import Image
-from io import BytesIO
 
-from openai import OpenAI
-import instructor
-from pydantic import BaseModel, Field
+def _file_digest(path: str) -> str:
+    """SHA-256 of a file's content."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
 
 
-class PdfReader:
+def _text_parts(text: str) -> list[dict]:
+    """Wrap document text as chat message content parts."""
+    return [{"type": "text", "text": text}]
+
+
+# Bound str.format of the JPEG data-URL template, mapped over every page.
+_jpeg_data_url = "data:image/jpeg;base64,{}".format
+
+
+def _image_parts(base64_images: Iterable[str]) -> list[dict]:
+    """Wrap base64-encoded JPEG pages as chat message content parts."""
+    return [{"type": "image_url", "image_url": {"url": url}} for url in map(_jpeg_data_url, base64_images)]
+
+
+def _file_parts(file_ids: list[str]) -> list[dict]:
+    """Wrap uploaded documents (OpenAI file ids) as chat message content parts."""
+    return [{"type": "file", "file": {"file_id": file_id}} for file_id in file_ids]
+
+
+class TextPdfReader:
     def __init__(self, pdf_path: str):
         self.pdf_path = pdf_path
 
-    def convert_to_images(self) -> list[Image.Image]:
-        """Convert PDF pages to images."""
-        return convert_from_path(self.pdf_path)
+    def extract_text(self) -> str:
+        """Extract the text layer of every page with pdfium; scanned pages yield no text."""
+        import pypdfium2 as pdfium
+
+        pdf = pdfium.PdfDocument(self.pdf_path)
+        try:
+            pages = []
+            for page in pdf:
+                text_page = page.get_textpage()
+                pages.append(text_page.get_text_range())
+                text_page.close()
+                page.close()
+        finally:
+            pdf.close()
+        return "\n\n".join(pages)
 
-    def convert_to_base64(self) -> list[str]:
-        """Convert images to base64-encoded strings."""
-        images = self.convert_to_images()
-        base64_images = []
 
-        for page in images:
-            buffered = BytesIO()
-            page.save(buffered, format="JPEG")
-            img_bytes = buffered.getvalue()
-            img_base64 = base64.b64encode(img_bytes).decode("utf-8")
-            base64_images.append(img_base64)
-        return base64_images
+class PdfReader:
+    def __init__(self, pdf_path: str, grayscale: bool = True):
+        """
+        :param pdf_path: Path of the PDF to read.
+        :param grayscale: Render scanned pages in grayscale; disable for color-critical documents.
+        """
+        self.pdf_path = pdf_path
+        self.grayscale = grayscale
 
+    def convert_to_base64(self) -> Iterator[str]:
+        """Render the PDF pages and yield them one by one as base64-encoded JPEGs."""
+        return _iter_pdf_pages_base64(self.pdf_path, self.grayscale)
 
+    async def upload_pages(self, client: OpenAIClient) -> list[str]:
+        """Upload the PDF through the Files API and return its file id."""
+        return [await client.upload_file(self.pdf_path)]
 
-class DocxReader:
+    def to_content_parts(self) -> list[dict]:
+        """
+        Content parts for the LLM: the PDF's text when it has a text layer,
+        otherwise (scanned documents) its rendered pages.
+        """
+        text = TextPdfReader(self.pdf_path).extract_text()
+        if len(text.strip()) >= MIN_TEXT_CHARS:
+            return _text_parts(text)
+        return _image_parts(self.convert_to_base64())
+
+    async def to_uploaded_content_parts(self, client: OpenAIClient) -> list[dict]:
+        """Like `to_content_parts`, but a scanned PDF is referenced as an uploaded file."""
+        text = await asyncio.to_thread(TextPdfReader(self.pdf_path).extract_text)
+        if len(text.strip()) >= MIN_TEXT_CHARS:
+            return _text_parts(text)
+        return _file_parts(await self.upload_pages(client))
+
+
+
+# Seconds to wait for a freshly started unoserver to accept connections.
+LIBREOFFICE_STARTUP_TIMEOUT = 60.0
+
+
+class LibreOfficeServer:
+    """
+    A headless LibreOffice kept running for the lifetime of the app (through unoserver),
+    so DOCX conversions reuse it instead of paying LibreOffice's start-up cost per file.
+    Its state is guarded by a lock, as conversions check it from worker threads.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 2003):
+        self.host = host
+        self.port = port
+        self._process = None
+        self._output = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        """True once the server accepts conversions; logs it if the process has died since."""
+        with self._lock:
+            return self._poll()
+
+    def _poll(self) -> bool:
+        """`running`, for callers holding the lock."""
+        if self._process is None:
+            return False
+        if self._process.poll() is not None:
+            self._log_failure(f"exited with code {self._process.returncode}")
+            self._reset()
+            return False
+        return self._ready
+
+    def start(self, python: str = None):
+        """
+        Start unoserver and block until it accepts connections.
+
+        unoserver has to run under a Python that can import LibreOffice's `uno` module
+        (LibreOffice's bundled interpreter, or the system python3 with python3-uno), which
+        is usually not the app's own interpreter, so a `unoserver` script found on PATH is
+        not used. Pass that interpreter as `python`, with unoserver installed into it;
+        without it, or if the server does not come up, conversions use one LibreOffice
+        process per file.
+        """
+        with self._lock:
+            self._start(python)
+
+    def _start(self, python: str = None):
+        if self._poll():
+            return
+        if not python:
+            logger.log_message(
+                "UNOSERVER_PYTHON is not set, DOCX files are converted by a new LibreOffice process each"
+            )
+            return
+        # unoserver.server has no __main__ block; call the console script's entry point.
+        command = [python, "-c", "from unoserver.server import main; main()"]
+        # Kept in a file rather than a pipe, which LibreOffice could fill and block on.
+        self._output = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            command + ["--interface", self.host, "--port", str(self.port)],
+            stdout=self._output,
+            stderr=subprocess.STDOUT,
+        )
+        deadline = time.monotonic() + LIBREOFFICE_STARTUP_TIMEOUT
+        while self._process.poll() is None and time.monotonic() < deadline:
+            try:
+                with socket.create_connection((self.host, self.port), timeout=1):
+                    self._ready = True
+                    return
+            except OSError:
+                time.sleep(0.5)
+        if self._process.poll() is None:
+            self._log_failure(f"was not reachable after {LIBREOFFICE_STARTUP_TIMEOUT:.0f}s")
+            self._terminate()
+        else:
+            self._log_failure(f"exited with code {self._process.returncode}")
+            self._reset()
+
+    def stop(self):
+        """Terminate the unoserver process and its LibreOffice instance."""
+        with self._lock:
+            self._terminate()
+
+    def _terminate(self):
+        if self._process is None:
+            return
+        if self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._reset()
+
+    def _log_failure(self, reason: str):
+        """Log why the server is unavailable, with the tail of its output."""
+        self._output.seek(0)
+        output = self._output.read().decode(errors="replace").strip()[-2000:]
+        logger.log_message(f"LibreOffice server {reason}: {output or 'no output'}", level="ERROR")
+
+    def _reset(self):
+        self._process = None
+        self._ready = False
+        if self._output is not None:
+            self._output.close()
+            self._output = None
+
+    def convert_to_pdf(self, input_path: str, output_pdf_path: str):
+        """Convert a document to PDF on the running server."""
+        from unoserver.client import UnoClient
+
+        client = UnoClient(server=self.host, port=str(self.port))
+        client.convert(inpath=input_path, outpath=output_pdf_path, convert_to="pdf")
+
+
+libreoffice_server = LibreOfficeServer()
+
+
+class DocxTextReader:
     def __init__(self, docx_path: str):
         self.docx_path = docx_path
 
-    def convert_to_images(self) -> list[Image.Image]:
-        """Convert DOCX pages to images by first converting DOCX to PDF then to images."""
-        with tempfile.TemporaryDirectory() as tmp_dir_name:
-            # Define output PDF path inside the temporary directory
-            pdf_output_path = os.path.join(tmp_dir_name, os.path.basename(self.docx_path).replace('.docx', '.pdf'))
+    def extract_text(self) -> str:
+        """
+        Read the paragraphs and table rows of a DOCX file directly, without rendering it,
+        including the section headers and footers, where resumes often keep contact details.
+        """
+        import docx
+
+        document = docx.Document(self.docx_path)
+        parts = [document]
+        for section in document.sections:
+            # A header or footer linked to the previous section repeats it; read it once.
+            parts.extend(part for part in (section.header, section.footer) if not part.is_linked_to_previous)
+        lines = []
+        for part in parts:
+            lines.extend(paragraph.text for paragraph in part.paragraphs)
+            for table in part.tables:
+                for row in table.rows:
+                    lines.append(" | ".join(cell.text for cell in row.cells))
+        return "\n".join(lines)
+
 
-            self.convert_docx_to_pdf(pdf_output_path)
+class DocxReader:
+    def __init__(self, docx_path: str, grayscale: bool = True):
+        """
+        :param docx_path: Path of the DOCX to read.
+        :param grayscale: Render image-only pages in grayscale; disable for color-critical documents.
+        """
+        self.docx_path = docx_path
+        self.grayscale = grayscale
 
-            # Ensure the PDF file was created successfully
-            if not os.path.exists(pdf_output_path):
-                raise FileNotFoundError(f"PDF file was not created at: {pdf_output_path}")
+    def _convert_to_pdf_in(self, tmp_dir_name: str) -> str:
+        """Convert the DOCX to a PDF inside `tmp_dir_name` and return the PDF's path."""
+        # Define output PDF path inside the temporary directory
+        pdf_output_path = os.path.join(tmp_dir_name, os.path.basename(self.docx_path).replace('.docx', '.pdf'))
 
-            # Convert the PDF to images
-            images = convert_from_path(pdf_output_path)
-        return images
+        self.convert_docx_to_pdf(pdf_output_path)
+
+        # Ensure the PDF file was created successfully
+        if not os.path.exists(pdf_output_path):
+            raise FileNotFoundError(f"PDF file was not created at: {pdf_output_path}")
+        return pdf_output_path
 
     def convert_to_base64(self) -> list[str]:
-        """Convert images to base64-encoded strings."""
-        images = self.convert_to_images()
-        base64_images = []
-        for page in images:
-            buffered = BytesIO()
-            page.save(buffered, format="JPEG")
-            img_bytes = buffered.getvalue()
-            img_base64 = base64.b64encode(img_bytes).decode("utf-8")
-            base64_images.append(img_base64)
-        return base64_images
+        """
+        Render the DOCX pages (through a PDF) and return them as base64-encoded JPEGs.
+        The result is cached by file content, so processing the same document again
+        (even from another upload) skips LibreOffice and rendering.
+        """
+        cache_key = (_file_digest(self.docx_path), self.grayscale)
+        with _docx_pages_lock:
+            pages = _docx_pages_cache.get(cache_key)
+            if pages is not None:
+                _docx_pages_cache.move_to_end(cache_key)
+        if pages is None:
+            with tempfile.TemporaryDirectory() as tmp_dir_name:
+                pages = tuple(_iter_pdf_pages_base64(self._convert_to_pdf_in(tmp_dir_name), self.grayscale))
+            with _docx_pages_lock:
+                _docx_pages_cache[cache_key] = pages
+                if len(_docx_pages_cache) > DOCX_PAGES_CACHE_SIZE:
+                    _docx_pages_cache.popitem(last=False)
+        return list(pages)
+
+    async def upload_pages(self, client: OpenAIClient) -> list[str]:
+        """
+        Convert the DOCX to PDF, upload that through the Files API and return its file id.
+        Uploads are keyed by the DOCX content, so a document already uploaded by this
+        client skips LibreOffice entirely.
+        """
+        digest = await asyncio.to_thread(_file_digest, self.docx_path)
+        file_id = client.uploaded_file_id(digest)
+        if file_id is None:
+            with tempfile.TemporaryDirectory() as tmp_dir_name:
+                pdf_output_path = await asyncio.to_thread(self._convert_to_pdf_in, tmp_dir_name)
+                file_id = await client.upload_file(pdf_output_path, digest=digest)
+        return [file_id]
+
+    def to_content_parts(self) -> list[dict]:
+        """
+        Content parts for the LLM: the document's text when it has enough of it,
+        otherwise (e.g. image-only documents) its rendered pages.
+        """
+        text = DocxTextReader(self.docx_path).extract_text()
+        if len(text.strip()) >= MIN_TEXT_CHARS:
+            return _text_parts(text)
+        return _image_parts(self.convert_to_base64())
+
+    async def to_uploaded_content_parts(self, client: OpenAIClient) -> list[dict]:
+        """Like `to_content_parts`, but an image-only document is referenced as an uploaded file."""
+        text = await asyncio.to_thread(DocxTextReader(self.docx_path).extract_text)
+        if len(text.strip()) >= MIN_TEXT_CHARS:
+            return _text_parts(text)
+        return _file_parts(await self.upload_pages(client))
 
     def convert_docx_to_pdf(self, output_pdf_path: str):
-        """Convert DOCX to PDF using LibreOffice in headless mode."""
+        """
+        Convert DOCX to PDF using LibreOffice in headless mode.
+        Uses the long-running LibreOffice server when it is up, else a one-off LibreOffice
+        process, and only falls back to docx2pdf (which drives Microsoft Word) when no
+        LibreOffice binary is installed.
+        """
+        try:
+            if libreoffice_server.running:
+                libreoffice_server.convert_to_pdf(self.docx_path, output_pdf_path)
+                return
+        except Exception as e:
+            logger.log_message(
+                f"LibreOffice server conversion failed, falling back to a new process: {e}", level="WARNING"
+            )
+        soffice = shutil.which("soffice") or shutil.which("libreoffice")
+        if soffice is None:
+            from docx2pdf import convert
+
+            convert(self.docx_path, output_pdf_path)
+            return
         try:
             result = subprocess.run(
-                ['libreoffice', '--headless', '--convert-to', 'pdf', '--outdir', os.path.dirname(output_pdf_path),
+                [soffice, '--headless', '--convert-to', 'pdf', '--outdir', os.path.dirname(output_pdf_path),
                  self.docx_path],
                 check=True,
                 stdout=subprocess.PIPE,
@@ -85,6 +445,12 @@ class DocxReader:
             raise Exception(f"Error converting DOCX to PDF: {e.stderr.decode()}")
 
 
+# LRU of rendered DOCX pages keyed by the SHA-256 of the file content and the grayscale flag.
+DOCX_PAGES_CACHE_SIZE = 64
+_docx_pages_cache: OrderedDict[tuple[str, bool], tuple[str, ...]] = OrderedDict()
+_docx_pages_lock = threading.Lock()
+
+
 class ExtractionResponse(BaseModel):
     extracted_content: str = Field(..., description="Extracted content from the image.")
     criteria: list[str] = Field(..., description="Extracted criteria from the image.")
@@ -124,11 +490,21 @@ class ScoreResponse(BaseModel):
     total_score: int = Field(..., description="Total score computed as the sum of individual scores.")
 
 
+class GroupedScoreResponse(BaseModel):
+    results: list[ScoreResponse] = Field(
+        ...,
+        description="One evaluation per resume, in the order the resumes were given."
+    )
+
+class WeakArea(BaseModel):
+    skill: str = Field(..., description="Skill that is present in the resume but needs improvement.")
+    suggestion: str = Field(..., description="Detailed suggestion and constructive feedback for the skill.")
+
 
 class EnhancementResponse(BaseModel):
 
     missing_skills: list[str] = Field(..., description="List of missing skills identified in the resume.")
-    weak_areas: list[dict[str,str]] = Field(..., description="List of weak areas identified in the resume.")
+    weak_areas: list[WeakArea] = Field(..., description="List of weak areas identified in the resume.")
     format_suggestions: list[str] = Field(..., description="List of format suggestions for the resume.")
 
 
@@ -161,6 +537,9 @@ Do not include any additional commentary or explanations. Begin the evaluation n
 RESUME_ENHANCEMENT_SYSTEM_PROMPT = """
 You are a world-class resume enhancement assistant. You will be provided with one or more images of a resume (in base64 format) along with a job description containing specific criteria. Your task is to review the resume thoroughly and provide constructive feedback based on the job description’s criteria.
 
+The job description criteria are:
+{criteria_list}
+
 Your analysis should include:
 1. Identification of skills present in the resume.
 2. Identification of any missing skills that are required per the criteria but absent from the resume.
@@ -209,23 +588,345 @@ Example Output:
 Ensure that the final output is valid JSON.
 """
 
+# The prompts are split around their {criteria_list} placeholder once at import,
+# so rendering one is a concatenation rather than a scan of the whole template.
+SCORE_PROMPT_PREFIX, SCORE_PROMPT_SUFFIX = SCORE_RESUME_PROMPT.split("{criteria_list}")
+ENHANCEMENT_PROMPT_PREFIX, ENHANCEMENT_PROMPT_SUFFIX = RESUME_ENHANCEMENT_SYSTEM_PROMPT.split("{criteria_list}")
+
+EXTRACT_TEXT_PART = {
+    "type": "text",
+    "text": "Extract the content from the image and identify key ranking criteria such as skills, certifications, experience, and qualifications.",
+}
+
+SCORE_TEXT_PART = {
+    "type": "text",
+    "text": "Please evaluate the resume based on the above criteria.",
+}
+
+SCORE_GROUP_TEXT_PART = {
+    "type": "text",
+    "text": (
+        "Please evaluate each of the resumes below based on the above criteria. "
+        "Each resume starts with a \"--- Resume N ---\" line. Return one evaluation per resume, "
+        "in the same order, each following the schema above."
+    ),
+}
+
+ENHANCE_TEXT_PART = {
+    "type": "text",
+    "text": "Please review the attached resume images and provide a detailed analysis based on the criteria provided above. Your analysis should identify any missing skills, highlight weak areas with actionable improvement suggestions, and offer recommendations to enhance the resume's format and overall presentation. Follow the JSON structure exactly as specified.",
+}
+
+# Resumes packed into one request by `score_resumes_grouped`, and the prompt size
+# a group may reach, leaving room in gpt-4o's 128k context for the response.
+SCORE_GROUP_SIZE = 4
+GROUP_MAX_PROMPT_TOKENS = 100_000
+
+# Default upper bound on in-flight OpenAI requests when scoring a batch of resumes.
+MAX_CONCURRENT_REQUESTS = 10
+
+# Rate-limited requests are retried with exponential backoff (1s, 2s, 4s, ...)
+# up to this many attempts in total.
+RATE_LIMIT_MAX_ATTEMPTS = 5
+
+# How often (seconds) the scheduler re-checks capacity while waiting.
+SCHEDULER_TICK = 0.05
+
+# Token cost assumed per page image (and per uploaded document): the maximum for a high-detail image
+# (85 base + 170 per 512px tile, 6 tiles).
+IMAGE_TOKEN_ESTIMATE = 1105
+
+# Uploaded documents expire on OpenAI's side after UPLOADED_FILE_TTL seconds, so
+# resumes are not kept in the account; a client remembers (for reuse) at most
+# UPLOADED_FILES_MAX of them and forgets the least recently used beyond that.
+UPLOADED_FILE_TTL = 24 * 3600
+UPLOADED_FILES_MAX = 256
+
+# Batch API polling: first wait (seconds), doubled up to the maximum.
+BATCH_POLL_INTERVAL = 10.0
+BATCH_MAX_POLL_INTERVAL = 300.0
+# Expiry of the document copies a batch references: past its 24h completion window,
+# so no document expires before the batch has read it.
+BATCH_FILE_TTL = 48 * 3600
+
+# Per-call timeout (seconds) and retry budget for OpenAI requests, so one slow
+# resume cannot hang a whole batch.
+REQUEST_TIMEOUT = 60.0
+MAX_RETRIES = 2
+
+# Parsed LLM responses are cached on disk here, keyed by a hash of the request,
+# so re-running the same document (and criteria) costs no API call.
+RESPONSE_CACHE_DIR = ".cache"
+
+# Page images need a vision model; plain text documents go to a cheaper text model.
+VISION_MODEL = "gpt-4o"
+TEXT_MODEL = "gpt-4o-mini"
+
+
+def _model_for(content_parts: list[dict]) -> str:
+    """Pick the model able to read the given content parts."""
+    if any(part["type"] != "text" for part in content_parts):
+        return VISION_MODEL
+    return TEXT_MODEL
+
+
+def _strict_schema(schema: dict) -> dict:
+    """
+    Make a JSON schema acceptable to strict structured outputs, in place: every object
+    must list all of its properties as required and forbid additional ones.
+    """
+    if isinstance(schema, dict):
+        if "properties" in schema:
+            schema["required"] = list(schema["properties"])
+            schema["additionalProperties"] = False
+        for value in schema.values():
+            _strict_schema(value)
+    elif isinstance(schema, list):
+        for value in schema:
+            _strict_schema(value)
+    return schema
+
+
+def _json_schema_response_format(model: type[BaseModel], schema: dict = None) -> dict:
+    """
+    Strict structured-outputs `response_format` for a pydantic model, or for `schema`
+    when the model's own schema needs narrowing (see `_score_response_format`).
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": _strict_schema(schema or model.model_json_schema()),
+            "strict": True,
+        },
+    }
+
+
+def _score_response_format(criteria: list[str], model: type[BaseModel] = ScoreResponse) -> dict:
+    """
+    `response_format` for `ScoreResponse`, or for `GroupedScoreResponse`, with `scores`
+    narrowed from a free-form dict, which strict mode rejects, to an object holding
+    exactly one integer per criterion.
+    """
+    schema = model.model_json_schema()
+    score_schema = schema["$defs"]["ScoreResponse"] if model is GroupedScoreResponse else schema
+    score_schema["properties"]["scores"] = {
+        "type": "object",
+        "description": score_schema["properties"]["scores"].get("description", ""),
+        "properties": {criterion: {"type": "integer"} for criterion in dict.fromkeys(criteria)},
+    }
+    return _json_schema_response_format(model, schema)
+
+
+def _check_completion(model: type[BaseModel], finish_reason: str, refusal: str | None) -> None:
+    """Raise for a completion that refused or was cut short, and so cannot hold a valid reply."""
+    if refusal:
+        raise RuntimeError(f"The model refused to produce a {model.__name__}: {refusal}")
+    if finish_reason != "stop":
+        raise RuntimeError(f"{model.__name__} completion ended with finish_reason={finish_reason!r}")
 
 
+def _estimate_tokens(system_prompt: str, content_parts: list[dict], file_pages: dict[str, int] = None) -> int:
+    """
+    Rough prompt size of a request, at ~4 characters per text token.
+    An uploaded file costs IMAGE_TOKEN_ESTIMATE per page, with page counts looked up
+    by file id in `file_pages` (one page if unknown).
+    """
+    tokens = len(system_prompt) // 4
+    for part in content_parts:
+        if part["type"] == "text":
+            tokens += len(part["text"]) // 4
+        elif part["type"] == "file" and file_pages:
+            tokens += IMAGE_TOKEN_ESTIMATE * file_pages.get(part["file"]["file_id"], 1)
+        else:
+            tokens += IMAGE_TOKEN_ESTIMATE
+    return tokens
 
 
+def _cache_key(*request: object) -> str:
+    """Content hash of everything that determines an LLM response."""
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
 
 
 class OpenAIClient:
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        max_requests_per_minute: int = MAX_REQUESTS_PER_MINUTE,
+        max_tokens_per_minute: int = MAX_TOKENS_PER_MINUTE,
+        cache_dir: str | None = RESPONSE_CACHE_DIR,
+    ):
+        """
+        :param cache_dir: Directory for the on-disk response cache; None disables caching.
+        """
         self.api_key = api_key
-        self.patched_client = instructor.from_openai(OpenAI(api_key=api_key))
+        self.cache_dir = cache_dir
+        self.max_concurrency = max_concurrency
+        self.max_requests_per_minute = max_requests_per_minute
+        self.max_tokens_per_minute = max_tokens_per_minute
+        # Rate-limit bucket and in-flight count shared by every scheduled call on this
+        # client, so concurrent batches together stay under the account's limits.
+        self._rate_lock = asyncio.Lock()
+        self._available_requests = float(max_requests_per_minute)
+        self._available_tokens = float(max_tokens_per_minute)
+        self._last_update = time.monotonic()
+        self._in_flight = 0
+        # One pooled HTTP/2 client for all calls, so connections and TLS sessions are reused.
+        self._http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=REQUEST_TIMEOUT,
+        )
+        self.client = AsyncOpenAI(
+            api_key=api_key, http_client=self._http_client, timeout=REQUEST_TIMEOUT, max_retries=MAX_RETRIES
+        )
+        # LRU of documents uploaded through `upload_file`: content digest -> (file id, upload time),
+        # and each live file's page count (for the token estimates) and content digest
+        # (for the response cache keys).
+        self._uploaded_files: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._uploaded_file_pages: dict[str, int] = {}
+        self._uploaded_file_digests: dict[str, str] = {}
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def get(cls, api_key: str, **kwargs) -> OpenAIClient:
+        """
+        Shared client for `api_key` (and options): every caller asking for the same one
+        gets the same instance, and with it the same warm HTTP/2 connection pool.
+        """
+        return cls(api_key, **kwargs)
+
+    def _cache_parts(self, content_parts: list[dict]) -> list[dict]:
+        """
+        Content parts as they go into a response cache key: uploaded files are identified by
+        their content digest, which, unlike the file id, is the same across re-uploads and restarts.
+        """
+        return [
+            {"type": "file", "sha256": self._uploaded_file_digests.get(part["file"]["file_id"], part["file"]["file_id"])}
+            if part["type"] == "file"
+            else part
+            for part in content_parts
+        ]
+
+    def _load_cached(self, key: str, response_model: type[BaseModel]) -> BaseModel | None:
+        """Return the cached response stored under `key`, or None on a miss."""
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(os.path.join(self.cache_dir, f"{key}.json"), encoding="utf-8") as f:
+                return response_model.model_validate_json(f.read())
+        except (OSError, ValidationError):
+            return None
+
+    def _store_cached(self, key: str, response: BaseModel) -> None:
+        """Write a response to the cache; the file is renamed into place so readers never see it half-written."""
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, f"{key}.json")
+        with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, suffix=".tmp", delete=False, encoding="utf-8") as f:
+            f.write(response.model_dump_json())
+        os.replace(f.name, path)
+
+    async def upload_file(self, path: str, digest: str = None) -> str:
+        """
+        Upload a document for use in `file` content parts and return its file id.
+        Each document is uploaded once per client: later calls with the same content
+        (SHA-256 of the file unless `digest` is given) reuse the file id, so a resume
+        scored against several criteria lists is not sent again. Uploads expire after
+        UPLOADED_FILE_TTL, and beyond UPLOADED_FILES_MAX the least recently used are forgotten.
+        """
+        if digest is None:
+            digest = await asyncio.to_thread(_file_digest, path)
+        file_id = self.uploaded_file_id(digest)
+        if file_id is not None:
+            return file_id
+
+        pages = await asyncio.to_thread(_pdf_page_count, path)
+        with open(path, "rb") as f:
+            uploaded = await self.client.files.create(
+                file=f,
+                purpose="user_data",
+                expires_after={"anchor": "created_at", "seconds": UPLOADED_FILE_TTL},
+            )
+        self._uploaded_files[digest] = (uploaded.id, time.monotonic())
+        self._uploaded_file_pages[uploaded.id] = pages
+        self._uploaded_file_digests[uploaded.id] = digest
+        while len(self._uploaded_files) > UPLOADED_FILES_MAX:
+            # Only forgotten, not deleted: in-flight requests may still reference the file,
+            # and it expires on its own.
+            _, (evicted_id, _) = self._uploaded_files.popitem(last=False)
+            self._uploaded_file_pages.pop(evicted_id, None)
+            self._uploaded_file_digests.pop(evicted_id, None)
+        return uploaded.id
+
+    def uploaded_file_id(self, digest: str) -> str | None:
+        """
+        File id of the document with content `digest` uploaded by this client, or None.
+        Files past half their TTL are forgotten (and left to expire), so no new request
+        references a file that may expire while it is in flight.
+        """
+        entry = self._uploaded_files.get(digest)
+        if entry is None:
+            return None
+        file_id, uploaded_at = entry
+        if time.monotonic() - uploaded_at > UPLOADED_FILE_TTL / 2:
+            del self._uploaded_files[digest]
+            self._uploaded_file_pages.pop(file_id, None)
+            self._uploaded_file_digests.pop(file_id, None)
+            return None
+        self._uploaded_files.move_to_end(digest)
+        return file_id
+
+    async def _delete_uploaded_file(self, file_id: str) -> None:
+        self._uploaded_file_pages.pop(file_id, None)
+        self._uploaded_file_digests.pop(file_id, None)
+        try:
+            await self.client.files.delete(file_id)
+        except Exception as e:
+            logger.log_message(f"Could not delete uploaded file {file_id}: {e}", level="WARNING")
+
+    async def aclose(self) -> None:
+        """Delete every document this client uploaded and close its HTTP connections."""
+        while self._uploaded_files:
+            _, (file_id, _) = self._uploaded_files.popitem(last=False)
+            await self._delete_uploaded_file(file_id)
+        await self._http_client.aclose()
+
+    async def _create_structured(
+        self, response_model: type[BaseModel], model: str, messages: list[dict], response_format: dict = None
+    ) -> BaseModel:
+        """
+        Run a chat completion with `response_model`'s strict JSON schema (or `response_format`)
+        as structured output and parse the reply with pydantic. A refusal, a truncated reply or
+        one that does not validate raises instead of being re-asked for with further billable
+        completions.
+        """
+        completion = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format=response_format or _json_schema_response_format(response_model),
+            temperature=0.0,
+            timeout=REQUEST_TIMEOUT,
+        )
+        choice = completion.choices[0]
+        _check_completion(response_model, choice.finish_reason, choice.message.refusal)
+        return response_model.model_validate_json(choice.message.content)
 
-    def extract_criteria_json(self, base64_images: list[str]) -> list[str]:
+    async def extract_criteria_json(self, content_parts: list[dict]) -> list[str]:
         """
-        Extract data from a base64-encoded image using OpenAI's API.
+        Extract data from a document (text or page images, see `to_content_parts`) using OpenAI's API.
+        Responses are cached on disk by document content.
         """
-        response = self.patched_client.chat.completions.create(
-            model="gpt-4o",
+        model = _model_for(content_parts)
+        cache_key = _cache_key("extract", model, EXTRACTION_AND_CRITERIA_PROMPT, self._cache_parts(content_parts))
+        cached = self._load_cached(cache_key, ExtractionResponse)
+        if cached is not None:
+            return cached.criteria
+
+        response = await self._create_structured(
+            model=model,
             messages=[
                 {
                     "role": "system",
@@ -233,129 +934,427 @@ class OpenAIClient:
                 },
                 {
                     "role": "user",
-                    "content": (
-                            [
-                                {
-                                    "type": "text",
-                                    "text": "Extract the content from the image and identify key ranking criteria such as skills, certifications, experience, and qualifications.",
-                                }
-                            ]
-                            + [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                                }
-                                for base64_image in base64_images
-                            ]
-                    ),
+                    "content": [EXTRACT_TEXT_PART, *content_parts],
                 },
             ],
             response_model=ExtractionResponse,
-            temperature=0.0,
-            max_retries=3,
-            timeout=None,
         )
+        self._store_cached(cache_key, response)
         return response.criteria
 
-    def score_resumes_against_criteria(self, criteria: list[str], base64_images: list[str]) -> ScoreResponse:
+    async def score_resumes_against_criteria(self, criteria: list[str], content_parts: list[dict]) -> ScoreResponse:
         """
-        Evaluate a single resume (provided as one or more base64-encoded images)
+        Evaluate a single resume (provided as content parts: its text or its page images)
         against a list of ranking criteria.
         The LLM returns a JSON with the candidate's name, individual scores per criterion, and the total score.
         """
+        return await self._score_one(
+            self._score_system_message(criteria), _score_response_format(criteria), content_parts
+        )
+
+    @staticmethod
+    def _score_system_message(criteria: list[str]) -> dict:
+        """
+        Render the scoring prompt for `criteria` as a system message.
+        The message is only read by the SDK, so one instance can be shared by every resume in a batch.
+        Messages are ordered static-first (system prompt, then the fixed instruction part, then
+        the resume), so all requests of a batch share their longest possible prefix and OpenAI's
+        automatic prompt caching can bill it at the cached rate once it reaches 1024 tokens.
+        """
         # Format the criteria list for inclusion in the prompt.
         criteria_list = "\n".join(f"- {criterion}" for criterion in criteria)
-        prompt = SCORE_RESUME_PROMPT.replace("{criteria_list}",criteria_list)
+        return {"role": "system", "content": f"{SCORE_PROMPT_PREFIX}{criteria_list}{SCORE_PROMPT_SUFFIX}"}
 
-        response = self.patched_client.chat.completions.create(
-            model="gpt-4o",
+    async def _score_one(self, system_message: dict, response_format: dict, content_parts: list[dict]) -> ScoreResponse:
+        """
+        Score one resume using an already rendered scoring system message and response format.
+        Responses are cached on disk by criteria and resume content.
+        """
+        model = _model_for(content_parts)
+        cache_key = _cache_key("score", model, system_message["content"], self._cache_parts(content_parts))
+        cached = self._load_cached(cache_key, ScoreResponse)
+        if cached is not None:
+            return cached
+
+        response = await self._create_structured(
+            model=model,
             messages=[
-                {"role": "system", "content": prompt},
+                system_message,
                 {
                     "role": "user",
-                    "content": (
-                            [
-                                {
-                                    "type": "text",
-                                    "text": "Please evaluate the resume based on the above criteria.",
-                                }
-                            ]
-                            + [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
-                                }
-                                for base64_image in base64_images
-                            ]
-                    ),
+                    "content": [SCORE_TEXT_PART, *content_parts],
                 },
             ],
             response_model=ScoreResponse,
-            temperature=0.0,
-            max_retries=3,
-            timeout=None,
+            response_format=response_format,
         )
+        self._store_cached(cache_key, response)
         return response
 
-    def score_multiple_resumes_against_criteria(self, criteria: list[str], resumes_base64: list[list[str]]) -> list[
-        ScoreResponse]:
+    async def score_multiple_resumes_against_criteria(self, criteria: list[str], resumes: list[list[dict]]) -> list[
+        ScoreResponse | None]:
         """
         Process multiple resumes at once.
         - `criteria` is a list of ranking criteria.
-        - `resumes_base64` is a list where each element is a list of base64-encoded images representing a single resume.
+        - `resumes` is a list where each element is the content parts (text or page images) of a single resume.
 
-        Returns a list of ScoreResponse objects, one per resume.
+        The prompt is rendered once for the whole batch, and the resumes are scored concurrently
+        within the client's request/token rate limits (see `_process_api_requests_from_list`).
+        Returns a list of ScoreResponse objects, one per resume, in input order. A resume that
+        could not be scored is logged and yields None, so one failure does not abort the batch.
         """
-        score_results = []
-        for resume_base64_images in resumes_base64:
-            score_response = self.score_resumes_against_criteria(criteria, resume_base64_images)
-            score_results.append(score_response)
-        return score_results
-
-    def provide_enhancements_based_on_job_description(self, criteria: list[str], resume_base64: list[str]):
+        system_message = self._score_system_message(criteria)
+        response_format = _score_response_format(criteria)
+        requests = [
+            (
+                _estimate_tokens(system_message["content"], resume, self._uploaded_file_pages),
+                functools.partial(self._score_one, system_message, response_format, resume),
+            )
+            for resume in resumes
+        ]
+        return await self._process_api_requests_from_list(requests)
 
-        criteria_list = "\n".join(f"- {criterion}" for criterion in criteria)
+    async def score_resumes_grouped(
+        self, criteria: list[str], resumes: list[list[dict]], group_size: int = SCORE_GROUP_SIZE
+    ) -> list[ScoreResponse | None]:
+        """
+        Like `score_multiple_resumes_against_criteria`, but packs up to `group_size` resumes
+        into each request, so the system prompt and per-request overhead are paid once per
+        group instead of once per resume. Groups are closed early when their estimated prompt
+        would exceed GROUP_MAX_PROMPT_TOKENS. The resumes of a group that fails, or whose
+        response cannot be matched to them, are re-scored one resume per request.
+        """
+        system_message = self._score_system_message(criteria)
+        response_format = _score_response_format(criteria)
+        group_response_format = _score_response_format(criteria, GroupedScoreResponse)
+        system_tokens = _estimate_tokens(system_message["content"], [])
+        groups: list[list[int]] = []
+        group_tokens: list[int] = []
+        for index, resume in enumerate(resumes):
+            tokens = _estimate_tokens("", resume, self._uploaded_file_pages)
+            if groups and len(groups[-1]) < group_size and group_tokens[-1] + tokens <= GROUP_MAX_PROMPT_TOKENS:
+                groups[-1].append(index)
+                group_tokens[-1] += tokens
+            else:
+                groups.append([index])
+                group_tokens.append(system_tokens + tokens)
+
+        requests = [
+            (
+                tokens,
+                functools.partial(
+                    self._score_group,
+                    system_message,
+                    response_format,
+                    group_response_format,
+                    [resumes[index] for index in group],
+                ),
+            )
+            for group, tokens in zip(groups, group_tokens)
+        ]
+        results = [None] * len(resumes)
+        fallback: list[int] = []
+        for group, group_results in zip(groups, await self._process_api_requests_from_list(requests)):
+            if group_results is not None:
+                for index, result in zip(group, group_results):
+                    results[index] = result
+            elif len(group) > 1:
+                fallback.extend(group)
+
+        if fallback:
+            # Resumes of failed groups go back through the scheduler one per request,
+            # so the retries stay under the same rate and concurrency limits.
+            single_requests = [
+                (
+                    system_tokens + _estimate_tokens("", resumes[index], self._uploaded_file_pages),
+                    functools.partial(self._score_one, system_message, response_format, resumes[index]),
+                )
+                for index in fallback
+            ]
+            for index, result in zip(fallback, await self._process_api_requests_from_list(single_requests)):
+                results[index] = result
+        return results
+
+    async def _score_group(
+        self, system_message: dict, response_format: dict, group_response_format: dict, resumes: list[list[dict]]
+    ) -> list[ScoreResponse] | None:
+        """
+        Score several resumes in one request. Returns None when the response does not hold
+        one result per resume; failures raise, RateLimitError included, for the scheduler.
+        """
+        if len(resumes) == 1:
+            return [await self._score_one(system_message, response_format, resumes[0])]
+        content_parts = [SCORE_GROUP_TEXT_PART]
+        for number, resume in enumerate(resumes, start=1):
+            content_parts.append({"type": "text", "text": f"--- Resume {number} ---"})
+            content_parts.extend(resume)
+        response = await self._create_structured(
+            model=_model_for(content_parts),
+            messages=[system_message, {"role": "user", "content": content_parts}],
+            response_model=GroupedScoreResponse,
+            response_format=group_response_format,
+        )
+        if len(response.results) == len(resumes):
+            return response.results
+        logger.log_message(
+            f"Grouped scoring returned {len(response.results)} results for {len(resumes)} resumes, "
+            "scoring them one by one",
+            level="WARNING",
+        )
+        return None
 
+    async def score_multiple_resumes_via_batch(
+        self, criteria: list[str], resumes: list[list[dict]]
+    ) -> list[ScoreResponse | None]:
+        """
+        Score resumes through the OpenAI Batch API, for offline jobs with no latency requirement:
+        half the price of synchronous calls and not subject to their rate limits, but results can
+        take up to 24 hours.
+
+        The requests are those of `score_multiple_resumes_against_criteria` (see `_create_structured`),
+        except that the Batch API needs one model for a whole input file: the batch uses the vision
+        model as soon as any resume is not plain text. Returns results in input order;
+        a resume whose request failed or returned invalid JSON is logged and yields None.
+
+        Uploaded documents are referenced through copies that expire after BATCH_FILE_TTL,
+        since the client's own uploads may expire or be deleted before the batch reads them.
+        The copies are not tracked by the client, and are deleted afterwards along with the
+        batch's input, output and error files.
+        """
+        system_message = self._score_system_message(criteria)
+        response_format = _score_response_format(criteria)
+        model = _model_for([part for resume in resumes for part in resume])
+        batch_file_ids = []
+        try:
+            file_copies = {}
+            for resume in resumes:
+                for part in resume:
+                    if part["type"] == "file" and part["file"]["file_id"] not in file_copies:
+                        file_id = part["file"]["file_id"]
+                        file_copies[file_id] = await self._copy_for_batch(file_id)
+                        batch_file_ids.append(file_copies[file_id])
+
+            with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False, encoding="utf-8") as f:
+                for index, resume in enumerate(resumes):
+                    content_parts = [
+                        _file_parts([file_copies[part["file"]["file_id"]]])[0] if part["type"] == "file" else part
+                        for part in resume
+                    ]
+                    request = {
+                        "custom_id": f"resume-{index}",
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": {
+                            "model": model,
+                            "messages": [
+                                system_message,
+                                {"role": "user", "content": [SCORE_TEXT_PART, *content_parts]},
+                            ],
+                            "temperature": 0.0,
+                            "response_format": response_format,
+                        },
+                    }
+                    f.write(json.dumps(request) + "\n")
+            try:
+                with open(f.name, "rb") as batch_input:
+                    input_file = await self.client.files.create(file=batch_input, purpose="batch")
+            finally:
+                os.unlink(f.name)
+            batch_file_ids.append(input_file.id)
+
+            batch = await self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
+            delay = BATCH_POLL_INTERVAL
+            while batch.status not in ("completed", "failed", "expired", "cancelled"):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, BATCH_MAX_POLL_INTERVAL)
+                batch = await self.client.batches.retrieve(batch.id)
+            batch_file_ids += [file_id for file_id in (batch.output_file_id, batch.error_file_id) if file_id]
+            if batch.status != "completed":
+                raise RuntimeError(f"Batch {batch.id} ended with status {batch.status}")
+
+            results = [None] * len(resumes)
+            if batch.output_file_id is None:
+                logger.log_message(f"Batch {batch.id} completed without any successful request", level="ERROR")
+            # Failed requests are only listed in the error file.
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id is None:
+                    continue
+                output = await self.client.files.content(file_id)
+                for line in output.text.splitlines():
+                    record = json.loads(line)
+                    index = int(record["custom_id"].removeprefix("resume-"))
+                    response = record.get("response") or {}
+                    if response.get("status_code") != 200:
+                        error = record.get("error") or response.get("body")
+                        logger.log_message(f"Batch request for resume {index} failed: {error}", level="ERROR")
+                        continue
+                    try:
+                        choice = response["body"]["choices"][0]
+                        _check_completion(ScoreResponse, choice["finish_reason"], choice["message"].get("refusal"))
+                        results[index] = ScoreResponse.model_validate_json(choice["message"]["content"])
+                    except (KeyError, IndexError, RuntimeError, ValidationError) as e:
+                        logger.log_message(f"Invalid batch response for resume {index}: {e}", level="ERROR")
+            return results
+        finally:
+            for file_id in batch_file_ids:
+                try:
+                    await self.client.files.delete(file_id)
+                except Exception as e:
+                    logger.log_message(f"Could not delete batch file {file_id}: {e}", level="WARNING")
+
+    async def _copy_for_batch(self, file_id: str) -> str:
+        """Upload a copy of an uploaded document that expires after BATCH_FILE_TTL and return its id."""
+        document = await self.client.files.retrieve(file_id)
+        content = await self.client.files.content(file_id)
+        copy = await self.client.files.create(
+            file=(document.filename, content.content),
+            purpose="user_data",
+            expires_after={"anchor": "created_at", "seconds": BATCH_FILE_TTL},
+        )
+        return copy.id
 
-        prompt = RESUME_ENHANCEMENT_SYSTEM_PROMPT.replace("{criteria_list}", criteria_list)
+    async def _process_api_requests_from_list(
+        self, requests: list[tuple[int, Callable[[], Awaitable]]]
+    ) -> list:
+        """
+        Run API calls concurrently while staying under the client's rate limits,
+        after the openai-cookbook parallel processor.
+
+        Each request is `(estimated_tokens, make_call)`. A call starts once the client's
+        shared capacity covers it (see `_try_acquire`), so concurrent calls of this method
+        draw from one budget. Calls rejected with a RateLimitError are retried with
+        exponential backoff. Returns the results in input order; a request that ultimately
+        fails is logged and yields None. Errors that no request can recover from (bad API key,
+        no permission, exhausted quota) cancel the remaining calls and are raised.
+        """
+        results = [None] * len(requests)
+        pending = deque(range(len(requests)))
+        retries: list[tuple[float, int, int]] = []  # heap of (ready_at, index, attempt)
+        in_flight: set[asyncio.Task] = set()
+        next_request = None
+        fatal_error = None
+
+        async def run(index: int, attempt: int):
+            nonlocal fatal_error
+            try:
+                results[index] = await requests[index][1]()
+            except (AuthenticationError, PermissionDeniedError) as e:
+                fatal_error = e
+            except RateLimitError as e:
+                if e.code == "insufficient_quota":
+                    fatal_error = e
+                    return
+                if attempt + 1 >= RATE_LIMIT_MAX_ATTEMPTS:
+                    logger.log_message(f"Request {index} still rate limited after {attempt + 1} attempts: {e}", level="ERROR")
+                    return
+                heapq.heappush(retries, (time.monotonic() + 2 ** attempt, index, attempt + 1))
+            except Exception as e:
+                logger.log_message(f"Request {index} failed: {e}", level="ERROR")
+            finally:
+                self._in_flight -= 1
+
+        while pending or retries or in_flight or next_request:
+            if fatal_error is not None:
+                for task in in_flight:
+                    task.cancel()
+                raise fatal_error
+            if next_request is None:
+                if retries and retries[0][0] <= time.monotonic():
+                    _, index, attempt = heapq.heappop(retries)
+                    next_request = (index, attempt)
+                elif pending:
+                    next_request = (pending.popleft(), 0)
+
+            if next_request is not None:
+                index, attempt = next_request
+                if await self._try_acquire(requests[index][0]):
+                    task = asyncio.create_task(run(index, attempt))
+                    in_flight.add(task)
+                    task.add_done_callback(in_flight.discard)
+                    next_request = None
+                    continue
+
+            await asyncio.sleep(SCHEDULER_TICK)
+
+        if fatal_error is not None:
+            raise fatal_error
+        return results
+
+    async def _try_acquire(self, tokens: int) -> bool:
+        """
+        Reserve capacity for one call of about `tokens` tokens from the client's shared
+        budget. Request and token capacity refill continuously up to one minute's worth;
+        the call may start once both cover it and fewer than `max_concurrency` calls are
+        in flight. Returns False, reserving nothing, if it may not start yet.
+        The caller releases the in-flight slot by decrementing `_in_flight` when done.
+        """
+        # A request larger than the whole budget would otherwise wait forever.
+        tokens = min(tokens, self.max_tokens_per_minute)
+        async with self._rate_lock:
+            now = time.monotonic()
+            elapsed, self._last_update = now - self._last_update, now
+            self._available_requests = min(
+                self.max_requests_per_minute,
+                self._available_requests + self.max_requests_per_minute * elapsed / 60,
+            )
+            self._available_tokens = min(
+                self.max_tokens_per_minute,
+                self._available_tokens + self.max_tokens_per_minute * elapsed / 60,
+            )
+            if (
+                self._in_flight >= self.max_concurrency
+                or self._available_requests < 1
+                or self._available_tokens < tokens
+            ):
+                return False
+            self._available_requests -= 1
+            self._available_tokens -= tokens
+            self._in_flight += 1
+            return True
+
+    async def provide_enhancements_based_on_job_description(self, criteria: list[str], resume: list[dict]):
+        return await self._enhance_one(self._enhancement_system_message(criteria), resume)
+
+    @staticmethod
+    def _enhancement_system_message(criteria: list[str]) -> dict:
+        """Render the enhancement prompt for `criteria` as a system message, shared like `_score_system_message`."""
+        criteria_list = "\n".join(f"- {criterion}" for criterion in criteria)
+        return {"role": "system", "content": f"{ENHANCEMENT_PROMPT_PREFIX}{criteria_list}{ENHANCEMENT_PROMPT_SUFFIX}"}
 
-        response = self.patched_client.chat.completions.create(
-            model="gpt-4o",
+    async def _enhance_one(self, system_message: dict, resume: list[dict]) -> EnhancementResponse:
+        """Get suggestions for one resume using an already rendered enhancement system message."""
+        return await self._create_structured(
+            model=_model_for(resume),
             messages=[
-                {"role": "system", "content": prompt},
+                system_message,
                 {
                     "role": "user",
-                    "content": (
-                            [
-                                {
-                                    "type": "text",
-                                    "text": "Please review the attached resume images and provide a detailed analysis based on the criteria provided above. Your analysis should identify any missing skills, highlight weak areas with actionable improvement suggestions, and offer recommendations to enhance the resume's format and overall presentation. Follow the JSON structure exactly as specified."
-                                }
-                            ]
-                            + [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}
-                                }
-                                for base64_image in resume_base64
-                            ]
-                    ),
+                    "content": [ENHANCE_TEXT_PART, *resume],
                 },
             ],
             response_model=EnhancementResponse,
-            temperature=0.0,
-            max_retries=3,
-            timeout=None,
         )
-        return response
 
-    def get_suggestions_for_multiple_resumes(self, job_criteria: list[str], resumes: list[list[str]]):
-
-        suggestions_list = []
-
-        for resume in resumes:
-
-            suggestions = self.provide_enhancements_based_on_job_description(job_criteria, resume)
-            suggestions_list.append(suggestions)
-
-        return suggestions_list
+    async def get_suggestions_for_multiple_resumes(
+        self, job_criteria: list[str], resumes: list[list[dict]]
+    ) -> list[EnhancementResponse | None]:
+        """
+        Get enhancement suggestions for several resumes concurrently, within the client's
+        request/token rate limits (see `_process_api_requests_from_list`).
+        The prompt is rendered once for the whole batch; see `_score_system_message` on why
+        every request then starts with the same tokens.
+        Returns results in input order; a resume that failed is logged and yields None.
+        """
+        system_message = self._enhancement_system_message(job_criteria)
+        requests = [
+            (
+                _estimate_tokens(system_message["content"], resume, self._uploaded_file_pages),
+                functools.partial(self._enhance_one, system_message, resume),
+            )
+            for resume in resumes
+        ]
+        return await self._process_api_requests_from_list(requests)